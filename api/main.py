@@ -1,11 +1,15 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, Request
-from fastapi.responses import FileResponse, HTMLResponse, RedirectResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, HTMLResponse, RedirectResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
 from pathlib import Path
+import msgspec
 
-from common.config import LOCAL_INPUT_DIR, STORAGE_BACKEND
-from common.storage import create_job_from_bytes, get_job, download_result_to_tempfile
+from common.config import LOCAL_INPUT_DIR
+# The backend (local/gcp/azure) and its settings are resolved once at import.
+from common.storage import COPY_CHUNK_SIZE, STORAGE
 
 app = FastAPI(title="Cloud Migration Demo API")
 
@@ -15,37 +19,71 @@ app.mount(
     StaticFiles(directory=str(Path(__file__).parent / "static"), check_dir=False),
     name="static",
 )
-templates = Jinja2Templates(directory=str(Path(__file__).parent / "templates"))
+
+# Templates ship with the image and never change at runtime: skip the per-render
+# mtime check and keep compiled bytecode on disk so worker processes share it.
+# With no directory, Jinja uses a per-user temp directory it creates with 0700
+# and refuses to use if another user owns it.
+templates = Jinja2Templates(
+    env=Environment(
+        loader=FileSystemLoader(str(Path(__file__).parent / "templates")),
+        auto_reload=False,
+        bytecode_cache=FileSystemBytecodeCache(),
+        autoescape=True,
+    )
+)
+
+# The empty upload form has no per-request context, so it is rendered once
+_UPLOAD_HTML = templates.get_template("index.html").render(job=None, job_id=None)
 
 # ---------- API endpoints ----------
+# Storage calls block (disk, SQLite, cloud SDKs). Handlers that touch storage are
+# either plain `def`, which FastAPI already runs in its threadpool, or `async def`
+# with the storage call wrapped in run_in_threadpool. Never call STORAGE directly
+# from an `async def` handler.
 
 @app.post("/jobs")
 async def create_job(file: UploadFile = File(...)):
-    content = await file.read()
-
-    from os import getenv
-    gcs_bucket = getenv("GCS_BUCKET", None)
-
-    job = create_job_from_bytes(file.filename, content, gcs_bucket=gcs_bucket)
-    return {"job_id": job.id, "status": job.status}
+    # Stream the spooled upload straight to storage, off the event loop
+    job = await run_in_threadpool(
+        STORAGE.create_job_from_file, file.filename, file.file, file.content_type
+    )
+    # Same fast path as read_job: msgspec writes the bytes, FastAPI's encoder is skipped
+    return Response(
+        msgspec.json.encode({"job_id": job.id, "status": job.status}),
+        media_type="application/json",
+    )
 
 @app.get("/jobs/{job_id}")
 def read_job(job_id: str):
-    from os import getenv
-    gcs_bucket = getenv("GCS_BUCKET", None)
-    job = get_job(job_id, gcs_bucket=gcs_bucket) if STORAGE_BACKEND == "gcp" else get_job(job_id)
+    job = STORAGE.get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
-    return job
+    # Job is a msgspec Struct: encode it directly instead of going through FastAPI's encoder
+    return Response(msgspec.json.encode(job), media_type="application/json")
+
+def _iter_and_close(reader):
+    try:
+        while chunk := reader.read(COPY_CHUNK_SIZE):
+            yield chunk
+    finally:
+        reader.close()
 
 @app.get("/jobs/{job_id}/result")
 def get_result(job_id: str):
-    from os import getenv
-    gcs_bucket = getenv("GCS_BUCKET", None)
-    job = get_job(job_id, gcs_bucket=gcs_bucket) if STORAGE_BACKEND == "gcp" else get_job(job_id)
+    job = STORAGE.get_job(job_id)
     if not job or not job.result_path:
         raise HTTPException(status_code=404, detail="Result not available")
-    path = download_result_to_tempfile(job, gcs_bucket=gcs_bucket) if STORAGE_BACKEND == "gcp" else Path(job.result_path)
+    # Cloud results are proxied chunk by chunk, so the first byte goes out before the whole blob is fetched
+    stream = STORAGE.open_result_stream(job)
+    if stream is not None:
+        reader, size, media_type = stream
+        return StreamingResponse(
+            _iter_and_close(reader),
+            media_type=media_type,
+            headers={"Content-Length": str(size)},
+        )
+    path = STORAGE.download_result_to_tempfile(job)
     if not path.exists():
         raise HTTPException(status_code=404, detail="Result file missing")
     return FileResponse(path)
@@ -53,11 +91,9 @@ def get_result(job_id: str):
 # ---------- Web UI endpoints ----------
 @app.get("/", response_class=HTMLResponse)
 def home(request: Request, job_id: str | None = None):
-    from os import getenv
-    gcs_bucket = getenv("GCS_BUCKET", None)
-    job = None
-    if job_id:
-        job = get_job(job_id, gcs_bucket=gcs_bucket) if STORAGE_BACKEND == "gcp" else get_job(job_id)
+    if not job_id:
+        return HTMLResponse(_UPLOAD_HTML)
+    job = STORAGE.get_job(job_id)
     return templates.TemplateResponse(
         "index.html",
         {"request": request, "job": job, "job_id": job_id},
@@ -65,20 +101,20 @@ def home(request: Request, job_id: str | None = None):
 
 @app.get("/upload", response_class=HTMLResponse)
 def upload_page(request: Request):
-    return templates.TemplateResponse(
-        "index.html",
-        {"request": request, "job": None, "job_id": None},
-    )
+    return HTMLResponse(_UPLOAD_HTML)
 
 @app.post("/upload", response_class=HTMLResponse)
 async def upload_image(request: Request, file: UploadFile = File(...)):
     if not file:
         raise HTTPException(status_code=400, detail="File required")
 
-    content = await file.read()
+    job = await run_in_threadpool(
+        STORAGE.create_job_from_file, file.filename, file.file, file.content_type
+    )
+    return RedirectResponse(url=f"/?job_id={job.id}", status_code=303)
 
-    from os import getenv
-    gcs_bucket = getenv("GCS_BUCKET", None)
 
-    job = create_job_from_bytes(file.filename, content, gcs_bucket=gcs_bucket)
-    return RedirectResponse(url=f"/?job_id={job.id}", status_code=303)
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=8000)
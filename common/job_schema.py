@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+import msgspec
 from typing import Optional
 from enum import Enum
 
@@ -8,7 +8,9 @@ class JobStatus(str, Enum):
     DONE = "DONE"
     FAILED = "FAILED"
 
-class Job(BaseModel):
+# Fields are only strings/enums, so a Job can never be part of a reference
+# cycle: gc=False keeps instances out of the cyclic garbage collector.
+class Job(msgspec.Struct, gc=False):
     id: str
     image_path: str          # where source image is stored
     result_path: Optional[str] = None
@@ -1,451 +1,836 @@
-import json
+import hashlib
+import msgspec
 import uuid
 import tempfile
 import os
+import shutil
+import sqlite3
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 from pathlib import Path
-from typing import List, Optional
-from dataclasses import dataclass, asdict
+from typing import BinaryIO, Callable, Dict, List, Optional, Protocol, Tuple, TypeVar
 
 # Import configuration variables.
-# BASE_DIR etc are used for local storage.
-# STORAGE_BACKEND determines which logic branch (local/gcp/azure) runs.
-from common.config import BASE_DIR, LOCAL_INPUT_DIR, LOCAL_OUTPUT_DIR, LOCAL_JOBS_FILE, STORAGE_BACKEND
+# LOCAL_* paths are used for local storage.
+# STORAGE_BACKEND determines which backend class (local/gcp/azure) is used.
+from common.config import LOCAL_INPUT_DIR, LOCAL_OUTPUT_DIR, LOCAL_JOBS_DB, STORAGE_BACKEND
 
 # Import the Job data model.
 from common.job_schema import Job, JobStatus
 
-# ------------------------------------------------------------------------------
-# CONDITIONAL IMPORTS
-# We wrap cloud SDK imports in try/except blocks.
-# This prevents the app from crashing locally if you haven't installed the cloud libraries yet,
-# or if you are running in a minimal environment that only needs one of them.
-# ------------------------------------------------------------------------------
-
-# 1. Google Cloud Storage SDK
-try:
-    from google.cloud import storage as gcs
-except ImportError:
-    gcs = None  # Set to None so we can check if it's available later
-
-# 2. Azure Blob Storage SDK
-try:
-    from azure.storage.blob import BlobServiceClient
-except ImportError:
-    BlobServiceClient = None
+# Cloud SDKs are imported inside the backend that needs them, so the local
+# backend (and anything that only imports Job/Protocol) never loads them and
+# a minimal environment can run without them installed.
 
 # ------------------------------------------------------------------------------
 # CONSTANTS
 # These define the folder structure inside our buckets/containers.
 # ------------------------------------------------------------------------------
-JOBS_OBJECT = "jobs/jobs.json"  # The file acting as our "database"
+JOB_ITEMS_PREFIX = "jobs/items/"  # One JSON object per job (our "database")
+PENDING_PREFIX = "jobs/pending/"  # Empty marker per PENDING job
 INPUT_PREFIX = "input/"         # Folder for uploaded images
 OUTPUT_PREFIX = "output/"       # Folder for processed images
-
-# Azure configuration from Environment Variables
-# We read these here so they are available to the helper functions below.
+COPY_CHUNK_SIZE = 1024 * 1024   # Buffer size when streaming uploads to disk
+
+# Downloaded blobs are kept on disk, keyed by object + version (GCS generation
+# or Azure ETag), so the same content is never fetched twice by one process.
+BLOB_CACHE_MAX_BYTES = int(os.getenv("BLOB_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Image transfers at or above this size are split into ranges/blocks moved by
+# TRANSFER_CONCURRENCY threads at once. Smaller ones stay a single request,
+# where splitting would only add round trips. (32 MiB is also the Azure SDK's
+# single-request limit, so both backends switch over at the same size.)
+PARALLEL_TRANSFER_MIN_BYTES = 32 * 1024 * 1024
+TRANSFER_CONCURRENCY = 4
+
+# Job records are only ever written by this module, so the read path reuses
+# prebuilt typed decoders instead of resolving the target type on every call,
+# and every write goes through one shared encoder.
+_JOB_DECODER = msgspec.json.Decoder(Job)
+_JOB_ENCODER = msgspec.json.Encoder()
+
+# Cloud configuration from Environment Variables
+# We read these here so they are available to the backends below.
+GCS_BUCKET = os.getenv("GCS_BUCKET")
 AZURE_CONN_STR = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
 AZURE_CONTAINER = os.getenv("AZURE_CONTAINER") 
 
+# Keep-alive connection pool shared by all calls of one cloud client. Sized above
+# the number of threads that may hit storage at once (API threadpool + uploads).
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "64"))
+
+
+def _pooled_session(session=None):
+    """Mounts a keep-alive pool of HTTP_POOL_SIZE HTTPS connections on session (a new one by default)."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = session if session is not None else requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=HTTP_POOL_SIZE,
+        # Only retry connections that could not be opened, where the request never
+        # went out. Anything else is left to the SDKs' own retry policies: a blind
+        # re-send of a marker delete that already succeeded would come back 404/412
+        # and read as "another worker claimed it", stranding the job.
+        max_retries=Retry(connect=3, read=0, status=0, other=0, backoff_factor=0.2),
+    )
+    session.mount("https://", adapter)
+    return session
 
-# ------------------------------------------------------------------------------
-# LOCAL FILESYSTEM HELPERS
-# Used when STORAGE_BACKEND="local". 
-# ------------------------------------------------------------------------------
 
-def _read_local_jobs() -> List[Job]:
-    """Reads the array of jobs from the local JSON file."""
-    # Read text from data/jobs.json. If empty or missing, default to "[]"
-    content = LOCAL_JOBS_FILE.read_text() if LOCAL_JOBS_FILE.exists() else "[]"
-    if not content.strip():
-        content = "[]"
-    data = json.loads(content)
-    # Convert list of dicts -> List[Job objects]
-    return [Job(**x) for x in data]
+# Number of job records whose last seen bytes are kept for conditional re-reads
+JOB_RECORD_CACHE_SIZE = 1024
 
-def _write_local_jobs(jobs: List[Job]) -> None:
-    """Writes the list of Job objects back to the local JSON file."""
-    # Convert List[Job objects] -> list of dicts -> JSON string
-    LOCAL_JOBS_FILE.write_text(json.dumps([j.dict() for j in jobs], indent=2))
 
+class _RecordCache:
+    """Remembers the last seen (version, raw bytes) of job records.
 
-# ------------------------------------------------------------------------------
-# GOOGLE CLOUD STORAGE (GCS) HELPERS
-# Used when STORAGE_BACKEND="gcp".
-# ------------------------------------------------------------------------------
+    version is the GCS generation or the Azure ETag. Re-reading a cached record
+    is a conditional GET: an unchanged record costs a 304 with no body.
+    """
 
-def _get_gcs_client():
-    """Returns an authenticated GCS client."""
-    if not gcs:
-        raise RuntimeError("google-cloud-storage library is not installed.")
-    return gcs.Client()
-
-def _ensure_bucket_exists(bucket_name: str):
-    """Checks if bucket exists; creates it if not. Returns the Bucket object."""
-    client = _get_gcs_client()
-    try:
-        bucket = client.get_bucket(bucket_name)
-    except Exception:
-        # If bucket doesn't exist or we can't access it, try creating it.
-        # Note: In production, you usually assume infrastructure exists.
-        bucket = client.create_bucket(bucket_name)
-    return bucket
-
-def _read_gcs_jobs(bucket_name: str) -> List[Job]:
-    """Downloads jobs/jobs.json from GCS and parses it."""
-    client = _get_gcs_client()
-    bucket = client.bucket(bucket_name)
-    blob = bucket.blob(JOBS_OBJECT)
-    
-    if not blob.exists():
-        return []
-    
-    data = blob.download_as_text()
-    return [Job(**x) for x in json.loads(data)]
-
-def _write_gcs_jobs(bucket_name: str, jobs: List[Job]):
-    """Serializes jobs list to JSON and uploads it to GCS."""
-    client = _get_gcs_client()
-    # We don't use _ensure_bucket_exists every time for speed, 
-    # but we assume the bucket exists by this point.
-    bucket = client.bucket(bucket_name)
-    blob = bucket.blob(JOBS_OBJECT)
-    
-    # upload_from_string handles the creation/overwrite of the file
-    blob.upload_from_string(
-        json.dumps([j.dict() for j in jobs], indent=2), 
-        content_type="application/json"
-    )
+    def __init__(self, max_entries: int = JOB_RECORD_CACHE_SIZE):
+        self._entries: "OrderedDict[str, Tuple[object, bytes]]" = OrderedDict()
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def get(self, job_id: str) -> Optional[Tuple[object, bytes]]:
+        with self._lock:
+            entry = self._entries.get(job_id)
+            if entry is not None:
+                self._entries.move_to_end(job_id)
+            return entry
+
+    def put(self, job_id: str, version: object, data: bytes) -> None:
+        with self._lock:
+            self._entries[job_id] = (version, data)
+            self._entries.move_to_end(job_id)
+            if len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+
+class _BlobCache:
+    """Local copies of downloaded blobs, keyed by (uri, version).
+
+    version is the GCS generation or the Azure ETag, so a file is only reused
+    while it still holds the object's current content. Files live in a private
+    directory of this process, removed at exit, and the least recently used ones
+    are deleted once they add up to more than max_bytes.
+    """
+
+    def __init__(self, max_bytes: int = BLOB_CACHE_MAX_BYTES):
+        self._entries: "OrderedDict[Tuple[str, object], Path]" = OrderedDict()
+        self._bytes = 0
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._dir: Optional[tempfile.TemporaryDirectory] = None
+
+    def fetch(self, uri: str, version: object, download: Callable[[Path], None]) -> Path:
+        """Returns the cached file for (uri, version), calling download(path) to fill it on a miss."""
+        key = (uri, version)
+        with self._lock:
+            path = self._entries.get(key)
+            if path is not None and path.exists():
+                self._entries.move_to_end(key)
+                return path
+            if self._dir is None:
+                self._dir = tempfile.TemporaryDirectory(prefix="cm_cache-")
+            directory = Path(self._dir.name)
+
+        digest = hashlib.sha1(f"{uri}\n{version}".encode()).hexdigest()
+        path = directory / f"{digest}{Path(uri).suffix}"
+        # Download next to the final name, then rename, so a reader never sees a partial file
+        partial = path.with_name(f"{path.name}.{threading.get_ident()}.part")
+        try:
+            download(partial)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+        os.replace(partial, path)
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = path
+                self._bytes += path.stat().st_size
+            # Evict least recently used files once over budget (always keep the new one)
+            while self._bytes > self._max_bytes and len(self._entries) > 1:
+                _, old_path = self._entries.popitem(last=False)
+                try:
+                    self._bytes -= old_path.stat().st_size
+                    old_path.unlink()
+                except FileNotFoundError:
+                    pass
+        return path
+
+
+# Hedged reads: a blob download that hasn't finished after HEDGE_DELAY_MS is
+# raced against a second, identical request, and the first to finish wins.
+# Costs an extra GET on slow reads only; off unless HEDGE_READS=1.
+HEDGE_READS = os.getenv("HEDGE_READS", "0") == "1"
+HEDGE_DELAY = float(os.getenv("HEDGE_DELAY_MS", "150")) / 1000
+_hedge_pool: Optional[ThreadPoolExecutor] = None
+_hedge_pool_lock = threading.Lock()
+
+T = TypeVar("T")
+
+
+def _hedged(read: Callable[[], T]) -> T:
+    """Runs read(), hedged as described above when enabled.
+
+    read must be safe to run twice at once; the request that loses the race
+    still runs to the end and its result is dropped.
+    """
+    global _hedge_pool
+    if not HEDGE_READS:
+        return read()
+    with _hedge_pool_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+
+    first = _hedge_pool.submit(read)
+    if wait([first], timeout=HEDGE_DELAY).done:
+        return first.result()
+    second = _hedge_pool.submit(read)
+
+    error = None
+    for future in as_completed([first, second]):
+        try:
+            result = future.result()
+        except Exception as e:
+            error = e  # The other request may still succeed
+            continue
+        return result
+    raise error
 
 
 # ------------------------------------------------------------------------------
-# AZURE BLOB STORAGE HELPERS
-# Used when STORAGE_BACKEND="azure".
+# STORAGE BACKEND INTERFACE
+# The API and Worker only talk to STORAGE (bottom of this file), which is one
+# of the classes below, chosen once from STORAGE_BACKEND at import time.
 # ------------------------------------------------------------------------------
 
-def _get_azure_client():
-    """Creates a BlobServiceClient using the connection string."""
-    if not BlobServiceClient:
-        raise RuntimeError("azure-storage-blob library is not installed.")
-    if not AZURE_CONN_STR:
-        raise ValueError("AZURE_STORAGE_CONNECTION_STRING env var is missing.")
-    return BlobServiceClient.from_connection_string(AZURE_CONN_STR)
-
-def _ensure_container_exists(client, container_name: str):
-    """Ensures the Azure container exists."""
-    # Check if container exists by trying to get a client for it
-    container_client = client.get_container_client(container_name)
-    if not container_client.exists():
-        container_client.create_container()
-    return container_client
-
-def _read_azure_jobs(container_name: str) -> List[Job]:
-    """Downloads jobs/jobs.json from Azure Blob and parses it."""
-    client = _get_azure_client()
-    container_client = client.get_container_client(container_name)
-    
-    # Get a blob client specifically for our database file
-    blob_client = container_client.get_blob_client(JOBS_OBJECT)
-    
-    if not blob_client.exists():
-        return []
-    
-    # Download content as text
-    data = blob_client.download_blob().readall()
-    return [Job(**x) for x in json.loads(data)]
-
-def _write_azure_jobs(container_name: str, jobs: List[Job]):
-    """Serializes jobs list to JSON and uploads/overwrites it on Azure."""
-    client = _get_azure_client()
-    container_client = client.get_container_client(container_name)
-    blob_client = container_client.get_blob_client(JOBS_OBJECT)
-    
-    # Upload the JSON string, overwriting if it exists
-    blob_client.upload_blob(
-        json.dumps([j.dict() for j in jobs], indent=2), 
-        overwrite=True
-    )
+class StorageBackend(Protocol):
+    def create_job_from_file(self, filename: str, fileobj: BinaryIO, content_type: Optional[str] = None) -> Job:
+        """
+        1. Streams the uploaded file object to the configured storage (input/ folder).
+        2. Creates a new Job object pointing to that file.
+        3. Adds the Job to the central jobs list (database).
+
+        The file is copied in chunks and never read into memory as a whole.
+        """
+        ...
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        """Retrieves a specific job by ID."""
+        ...
+
+    def update_job(self, job: Job) -> None:
+        """
+        Updates the status or result path of a job in the database.
+        Writes only this job's record, unconditionally: after the claim in
+        get_next_pending_job, the claiming worker is the record's only writer,
+        so there is no read-modify-write for another process to interleave with.
+        """
+        ...
+
+    def get_next_pending_job(self) -> Optional[Job]:
+        """
+        Finds the first job with status='PENDING' and claims it, so each job is handed
+        out once even to concurrent workers (threads or processes).
+        """
+        ...
+
+    def download_input_to_buffer(self, job: Job) -> BinaryIO:
+        """
+        Used by the worker to process the image.
+        Returns the job's 'image_path' as a readable binary file object (cloud
+        backends open their blob cache copy). The caller closes it.
+        """
+        ...
+
+    def upload_output_from_buffer(self, data: BinaryIO, job: Job) -> str:
+        """
+        Uploads the processed PNG, read from a binary file object positioned at its
+        start, to the backend output folder.
+        Returns the new remote path string (e.g. gs://... or az://...).
+        Sets job.result_path but does not save the job: the caller persists it with
+        update_job(), typically together with its final status.
+        """
+        ...
+
+    def download_result_to_tempfile(self, job: Job) -> Path:
+        """
+        Used by the API to serve the result image to the user.
+        Gets the 'result_path' as a local file so the API can return it as a FileResponse
+        (cloud backends serve it from their blob cache; the file must not be deleted).
+        """
+        ...
+
+    def open_result_stream(self, job: Job) -> Optional[Tuple[BinaryIO, int, str]]:
+        """
+        Opens the 'result_path' for streaming straight from the backend.
+        Returns (readable file object, size in bytes, content type), or None when the
+        backend has nothing better than download_result_to_tempfile to offer.
+        """
+        ...
 
 
 # ------------------------------------------------------------------------------
-# PUBLIC API FUNCTIONS
-# These functions abstract away the backend logic. The API and Worker call THESE.
-# They check STORAGE_BACKEND and route to the correct helper above.
+# LOCAL FILESYSTEM BACKEND
+# Used when STORAGE_BACKEND="local".
 # ------------------------------------------------------------------------------
 
-def create_job_from_bytes(filename: str, content_bytes: bytes, gcs_bucket: Optional[str] = None) -> Job:
-    """
-    1. Uploads the raw file bytes to the configured storage (input/ folder).
-    2. Creates a new Job object pointing to that file.
-    3. Adds the Job to the central jobs list (database).
-    """
-    job_id = str(uuid.uuid4())
-    
-    if STORAGE_BACKEND == "local":
+# data/jobs.db is a SQLite database in WAL mode: readers never block the
+# writer, and the API and worker processes can safely share it.
+_LOCAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    image_path TEXT NOT NULL,
+    result_path TEXT,
+    status TEXT NOT NULL,
+    error TEXT
+)
+"""
+# The worker polls for the oldest PENDING job; (status, rowid) order lets SQLite
+# jump straight to it instead of scanning every finished job first.
+_LOCAL_STATUS_INDEX = "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)"
+_LOCAL_COLUMNS = "id, image_path, result_path, status, error"
+
+def _close_connections(connections: List[sqlite3.Connection], lock: threading.Lock) -> None:
+    """Closes and forgets every connection in the list."""
+    with lock:
+        for conn in connections:
+            conn.close()
+        connections.clear()
+
+def _row_to_job(row: Tuple) -> Job:
+    """Converts a (id, image_path, result_path, status, error) row into a Job."""
+    job_id, image_path, result_path, status, error = row
+    return Job(id=job_id, image_path=image_path, result_path=result_path,
+               status=JobStatus(status), error=error)
+
+
+class LocalBackend:
+    def __init__(self):
+        # Each thread keeps one open connection for the life of the process, so
+        # a query costs no open/close, path lookup or PRAGMA/schema setup.
+        self._thread_state = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        # Runs close() when the backend is garbage collected, or at exit if it is
+        # still alive then. Unlike atexit.register(self.close), this holds no
+        # reference to the backend, so a dropped backend is freed right away.
+        self._finalizer = weakref.finalize(self, _close_connections, self._connections, self._connections_lock)
+
+    def _db(self) -> sqlite3.Connection:
+        """Returns this thread's connection to the local jobs database, opening it on first use."""
+        conn = getattr(self._thread_state, "conn", None)
+        if conn is None:
+            # check_same_thread=False only so close() can run from the finalizer;
+            # a connection is otherwise only ever used by the thread that opened it.
+            conn = sqlite3.connect(LOCAL_JOBS_DB, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_LOCAL_SCHEMA)
+            conn.execute(_LOCAL_STATUS_INDEX)
+            self._thread_state.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self) -> None:
+        """Closes every connection opened by this backend."""
+        self._finalizer()
+
+    def create_job_from_file(self, filename: str, fileobj: BinaryIO, content_type: Optional[str] = None) -> Job:
         # Ensure directory exists
         LOCAL_INPUT_DIR.mkdir(parents=True, exist_ok=True)
         dest = LOCAL_INPUT_DIR / filename
-        dest.write_bytes(content_bytes)
-        
-        # Create job pointing to local path
-        job = Job(id=job_id, image_path=str(dest), status=JobStatus.PENDING)
-        
-        # Update "Database"
-        jobs = _read_local_jobs()
-        jobs.append(job)
-        _write_local_jobs(jobs)
-        return job
+        with dest.open("wb") as f:
+            shutil.copyfileobj(fileobj, f, length=COPY_CHUNK_SIZE)
 
-    elif STORAGE_BACKEND == "gcp":
-        if not gcs_bucket:
-            raise ValueError("gcs_bucket is required for GCP backend")
-            
-        # Upload file to GCS
-        client = _get_gcs_client()
-        bucket = _ensure_bucket_exists(gcs_bucket)
-        object_name = f"{INPUT_PREFIX}{filename}" # e.g. input/image.jpg
-        blob = bucket.blob(object_name)
-        blob.upload_from_string(content_bytes, content_type="application/octet-stream")
-        
-        # Standard GCS URI format: gs://bucket-name/path/to/obj
-        image_path = f"gs://{gcs_bucket}/{object_name}"
-
-        # Update "Database"
-        job = Job(id=job_id, image_path=image_path, status=JobStatus.PENDING)
-        jobs = _read_gcs_jobs(gcs_bucket)
-        jobs.append(job)
-        _write_gcs_jobs(gcs_bucket, jobs)
+        # Create job pointing to local path
+        job = Job(id=str(uuid.uuid4()), image_path=str(dest), status=JobStatus.PENDING)
+
+        # Update "Database" (the connection context commits the transaction)
+        with self._db() as conn:
+            conn.execute(
+                f"INSERT INTO jobs ({_LOCAL_COLUMNS}) VALUES (?, ?, ?, ?, ?)",
+                (job.id, job.image_path, job.result_path, job.status.value, job.error),
+            )
         return job
 
-    elif STORAGE_BACKEND == "azure":
-        if not AZURE_CONTAINER:
-            raise ValueError("AZURE_CONTAINER env var is required for Azure backend")
-            
-        client = _get_azure_client()
-        container_client = _ensure_container_exists(client, AZURE_CONTAINER)
-        
-        object_name = f"{INPUT_PREFIX}{filename}" # e.g. input/image.jpg
-        blob_client = container_client.get_blob_client(object_name)
-        
-        # Upload file to Azure Blob
-        blob_client.upload_blob(content_bytes, overwrite=True)
-        
-        # We invent a custom URI scheme for internal tracking: az://container/path
-        # This makes it easy to recognize Azure paths later.
-        image_path = f"az://{AZURE_CONTAINER}/{object_name}"
-        
-        # Update "Database"
-        job = Job(id=job_id, image_path=image_path, status=JobStatus.PENDING)
-        jobs = _read_azure_jobs(AZURE_CONTAINER)
-        jobs.append(job)
-        _write_azure_jobs(AZURE_CONTAINER, jobs)
-        return job
+    def get_job(self, job_id: str) -> Optional[Job]:
+        # Primary-key lookup
+        row = self._db().execute(f"SELECT {_LOCAL_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def update_job(self, job: Job) -> None:
+        # Only this job's row is rewritten
+        with self._db() as conn:
+            conn.execute(
+                "UPDATE jobs SET image_path = ?, result_path = ?, status = ?, error = ? WHERE id = ?",
+                (job.image_path, job.result_path, job.status.value, job.error, job.id),
+            )
+
+    def get_next_pending_job(self) -> Optional[Job]:
+        # Oldest PENDING job first, claimed in the same statement by moving it to
+        # PROCESSING, so concurrent workers (threads or processes) never share a job
+        with self._db() as conn:
+            row = conn.execute(
+                f"""UPDATE jobs SET status = ?
+                    WHERE rowid = (SELECT rowid FROM jobs WHERE status = ? ORDER BY rowid LIMIT 1)
+                    RETURNING {_LOCAL_COLUMNS}""",
+                (JobStatus.PROCESSING.value, JobStatus.PENDING.value),
+            ).fetchone()
+        return _row_to_job(row) if row else None
+
+    def download_input_to_buffer(self, job: Job) -> BinaryIO:
+        # Already on disk: hand out the file itself rather than a copy in memory
+        return open(job.image_path, "rb")
+
+    def upload_output_from_buffer(self, data: BinaryIO, job: Job) -> str:
+        LOCAL_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+        dest = LOCAL_OUTPUT_DIR / f"{job.id}.png"
+        with dest.open("wb") as f:
+            shutil.copyfileobj(data, f, length=COPY_CHUNK_SIZE)
+        job.result_path = str(dest)
+        return job.result_path
 
-    else:
-        raise RuntimeError(f"Unsupported STORAGE_BACKEND: {STORAGE_BACKEND}")
+    def download_result_to_tempfile(self, job: Job) -> Path:
+        return Path(job.result_path)
 
+    def open_result_stream(self, job: Job) -> Optional[Tuple[BinaryIO, int, str]]:
+        # Results are already on local disk; FileResponse serves them directly
+        return None
 
-def get_job(job_id: str, gcs_bucket: Optional[str] = None) -> Optional[Job]:
-    """Retrieves a specific job by ID from the backend's job list."""
-    
-    if STORAGE_BACKEND == "local":
-        jobs = _read_local_jobs()
-    elif STORAGE_BACKEND == "gcp":
-        jobs = _read_gcs_jobs(gcs_bucket)
-    elif STORAGE_BACKEND == "azure":
-        jobs = _read_azure_jobs(AZURE_CONTAINER)
-    else:
-        raise RuntimeError(f"Unsupported STORAGE_BACKEND: {STORAGE_BACKEND}")
 
-    # Search list for matching ID
-    return next((j for j in jobs if j.id == job_id), None)
+# ------------------------------------------------------------------------------
+# GOOGLE CLOUD STORAGE (GCS) BACKEND
+# Used when STORAGE_BACKEND="gcp".
+# Each job lives in its own small object (jobs/items/{id}.json), and every
+# PENDING job also has an empty marker object under jobs/pending/. Reads and
+# updates touch one object instead of round-tripping the whole job list.
+# Concurrency is handled with generation preconditions rather than locks: a
+# job record is only created if absent, and a worker claims a job by deleting
+# its marker at the generation it listed, so two workers never get the same job.
+# Transfers use the JSON API over the pooled HTTP session. The library's gRPC
+# client (storage.grpc_client.GrpcClient) only exposes raw storage_v2 RPCs, not
+# Blob/Bucket objects or generation-precondition helpers, so it is not a drop-in
+# swap for the calls below; revisit once it reaches parity.
+# ------------------------------------------------------------------------------
 
+class GCSBackend:
+    def __init__(self, bucket_name: Optional[str]):
+        if not bucket_name:
+            raise ValueError("GCS_BUCKET env var is required for GCP backend")
+        try:
+            from google.cloud import storage as gcs
+            from google.cloud.storage import transfer_manager
+            from google.api_core.exceptions import NotFound, NotModified, PreconditionFailed
+        except ImportError as e:
+            raise RuntimeError("google-cloud-storage library is not installed.") from e
+        self._gcs = gcs
+        self._transfer_manager = transfer_manager
+        self._NotFound = NotFound
+        self._NotModified = NotModified
+        self._PreconditionFailed = PreconditionFailed
+        self.bucket_name = bucket_name
+        # One client (credentials + HTTP session) and one Bucket handle per bucket
+        # name are shared by the whole process instead of being rebuilt per call.
+        self._client = None
+        self._buckets: Dict[str, "google.cloud.storage.Bucket"] = {}
+        self._lock = threading.Lock()
+        # Runs the small job-record write of create_job_from_file next to the image
+        # upload, which stays on the caller's thread so concurrent requests never
+        # queue behind each other's uploads
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="gcs")
+        self._blob_cache = _BlobCache()
+        self._records = _RecordCache()
+
+    def _get_client(self):
+        """Returns the authenticated GCS client, creating it on first use."""
+        with self._lock:
+            if self._client is None:
+                import google.auth
+                from google.auth.transport.requests import AuthorizedSession
+
+                credentials, project = google.auth.default(scopes=self._gcs.Client.SCOPE)
+                http = _pooled_session(AuthorizedSession(credentials))
+                self._client = self._gcs.Client(project=project, credentials=credentials, _http=http)
+            return self._client
+
+    def _get_bucket(self, bucket_name: Optional[str] = None):
+        """Returns a cached Bucket handle (defaults to the configured bucket).
+
+        This uses client.bucket(), which makes no request: the bucket is assumed
+        to exist (it is provisioned up front, see README), and a missing bucket
+        surfaces as an error on the first real call instead of being probed for.
+        """
+        bucket_name = bucket_name or self.bucket_name
+        bucket = self._buckets.get(bucket_name)
+        if bucket is None:
+            bucket = self._buckets.setdefault(bucket_name, self._get_client().bucket(bucket_name))
+        return bucket
+
+    @staticmethod
+    def _parse_uri(uri: str) -> Tuple[str, str]:
+        """Splits gs://bucket/path/to/obj into (bucket, path/to/obj)."""
+        _, _, remainder = uri.partition("gs://")
+        bucket_name, _, object_name = remainder.partition("/")
+        return bucket_name, object_name
+
+    def _write_job(self, job: Job, if_generation_match: Optional[int] = None) -> None:
+        """Uploads a single job record (if_generation_match=0 means create-only)."""
+        blob = self._get_bucket().blob(f"{JOB_ITEMS_PREFIX}{job.id}.json")
+        data = _JOB_ENCODER.encode(job)
+        blob.upload_from_string(
+            data,
+            content_type="application/json",
+            if_generation_match=if_generation_match,
+        )
+        self._records.put(job.id, blob.generation, data)
+
+    def create_job_from_file(self, filename: str, fileobj: BinaryIO, content_type: Optional[str] = None) -> Job:
+        object_name = f"{INPUT_PREFIX}{filename}" # e.g. input/image.jpg
+        # Standard GCS URI format: gs://bucket-name/path/to/obj
+        image_path = f"gs://{self.bucket_name}/{object_name}"
+        job = Job(id=str(uuid.uuid4()), image_path=image_path, status=JobStatus.PENDING)
+
+        # Upload file to GCS while the job record is written. Nobody looks at the
+        # record until its pending marker exists, which is only added afterwards.
+        record = self._pool.submit(self._write_job, job, if_generation_match=0)
+        blob = self._get_bucket().blob(object_name)
+        # With a known size the library sends one multipart request instead of
+        # opening a resumable session first (rewind=True seeks back to the start)
+        size = fileobj.seek(0, os.SEEK_END)
+        blob.upload_from_file(
+            fileobj, content_type=content_type or "application/octet-stream", size=size, rewind=True,
+        )
+        record.result()
+
+        # Update "Database": make the job visible to workers
+        self._get_bucket().blob(f"{PENDING_PREFIX}{job.id}").upload_from_string(b"")
+        return job
 
-def update_job(job: Job, gcs_bucket: Optional[str] = None) -> None:
-    """Updates the status or result path of a job in the database."""
-    
-    # 1. Read current list
-    if STORAGE_BACKEND == "local":
-        jobs = _read_local_jobs()
-    elif STORAGE_BACKEND == "gcp":
-        jobs = _read_gcs_jobs(gcs_bucket)
-    elif STORAGE_BACKEND == "azure":
-        jobs = _read_azure_jobs(AZURE_CONTAINER)
-    else:
-        raise RuntimeError(f"Unsupported STORAGE_BACKEND: {STORAGE_BACKEND}")
+    def get_job(self, job_id: str) -> Optional[Job]:
+        # Downloads jobs/items/{job_id}.json and parses it. A missing object is
+        # reported by the download itself, so no separate exists() round trip.
+        # If we already hold a copy, the GET only returns a body when it changed.
+        blob = self._get_bucket().blob(f"{JOB_ITEMS_PREFIX}{job_id}.json")
+        cached = self._records.get(job_id)
+        try:
+            data = blob.download_as_bytes(if_generation_not_match=cached[0] if cached else None)
+        except self._NotModified:
+            data = cached[1]
+        except self._NotFound:
+            return None
+        else:
+            self._records.put(job_id, blob.generation, data)
+        return _JOB_DECODER.decode(data)
+
+    def update_job(self, job: Job) -> None:
+        self._write_job(job)
+
+    def get_next_pending_job(self) -> Optional[Job]:
+        # Markers are listed in name order (i.e. by job id), not by creation time.
+        for marker in self._get_client().list_blobs(self.bucket_name, prefix=PENDING_PREFIX):
+            # Claim the job: only one caller can delete this exact generation.
+            try:
+                marker.delete(if_generation_match=marker.generation)
+            except (self._PreconditionFailed, self._NotFound):
+                continue  # Another worker got there first
+            job = self.get_job(marker.name[len(PENDING_PREFIX):])
+            if job and job.status == JobStatus.PENDING:
+                return job
+        return None
+
+    def _download_cached(self, uri: str) -> Path:
+        """Downloads a gs:// object to the local blob cache, reusing an earlier copy of the same generation."""
+        bucket_name, object_name = self._parse_uri(uri)
+        blob = self._get_bucket(bucket_name).blob(object_name)
+        blob.reload()  # Metadata only: tells us which generation is current
+
+        def download(path: Path) -> None:
+            if blob.size >= PARALLEL_TRANSFER_MIN_BYTES:
+                self._transfer_manager.download_chunks_concurrently(
+                    blob, str(path),
+                    chunk_size=PARALLEL_TRANSFER_MIN_BYTES,
+                    download_kwargs={"if_generation_match": blob.generation},
+                    worker_type=self._transfer_manager.THREAD,
+                    max_workers=TRANSFER_CONCURRENCY,
+                )
+            else:
+                blob.download_to_filename(str(path), if_generation_match=blob.generation)
+
+        return self._blob_cache.fetch(uri, blob.generation, download)
+
+    def download_input_to_buffer(self, job: Job) -> BinaryIO:
+        if not job.image_path.startswith("gs://"):
+            raise ValueError(f"Invalid GCS path: {job.image_path}")
+        return open(_hedged(lambda: self._download_cached(job.image_path)), "rb")
+
+    def upload_output_from_buffer(self, data: BinaryIO, job: Job) -> str:
+        object_name = f"{OUTPUT_PREFIX}{job.id}.png"
+        blob = self._get_bucket().blob(object_name)
+        size = data.seek(0, os.SEEK_END)
+        if size >= PARALLEL_TRANSFER_MIN_BYTES:
+            # Multipart upload, parts sent side by side. The transfer manager reads
+            # each part from a file by name, so spool the PNG to one first.
+            data.seek(0)
+            with tempfile.NamedTemporaryFile(suffix=".png") as tmp:
+                shutil.copyfileobj(data, tmp, length=COPY_CHUNK_SIZE)
+                tmp.flush()
+                self._transfer_manager.upload_chunks_concurrently(
+                    tmp.name, blob,
+                    content_type="image/png",
+                    chunk_size=PARALLEL_TRANSFER_MIN_BYTES,
+                    worker_type=self._transfer_manager.THREAD,
+                    max_workers=TRANSFER_CONCURRENCY,
+                )
+        else:
+            # Sized, so the PNG goes up in one request rather than a resumable session
+            blob.upload_from_file(data, content_type="image/png", size=size, rewind=True)
 
-    # 2. Modify the specific job in the list
-    for i, j in enumerate(jobs):
-        if j.id == job.id:
-            jobs[i] = job
-            break
-            
-    # 3. Write the list back
-    if STORAGE_BACKEND == "local":
-        _write_local_jobs(jobs)
-    elif STORAGE_BACKEND == "gcp":
-        _write_gcs_jobs(gcs_bucket, jobs)
-    elif STORAGE_BACKEND == "azure":
-        _write_azure_jobs(AZURE_CONTAINER, jobs)
+        result_path = f"gs://{self.bucket_name}/{object_name}"
+        job.result_path = result_path
+        return result_path
 
+    def download_result_to_tempfile(self, job: Job) -> Path:
+        if not (job.result_path and job.result_path.startswith("gs://")):
+            raise ValueError("job.result_path missing or not a GCS path")
+        return _hedged(lambda: self._download_cached(job.result_path))
 
-def get_next_pending_job(gcs_bucket: Optional[str] = None) -> Optional[Job]:
-    """Finds the first job with status='PENDING'."""
-    
-    if STORAGE_BACKEND == "local":
-        jobs = _read_local_jobs()
-    elif STORAGE_BACKEND == "gcp":
-        jobs = _read_gcs_jobs(gcs_bucket)
-    elif STORAGE_BACKEND == "azure":
-        jobs = _read_azure_jobs(AZURE_CONTAINER)
-    else:
-        raise RuntimeError(f"Unsupported STORAGE_BACKEND: {STORAGE_BACKEND}")
-        
-    for j in jobs:
-        if j.status == JobStatus.PENDING:
-            return j
-    return None
+    def open_result_stream(self, job: Job) -> Optional[Tuple[BinaryIO, int, str]]:
+        if not (job.result_path and job.result_path.startswith("gs://")):
+            raise ValueError("job.result_path missing or not a GCS path")
+        bucket_name, object_name = self._parse_uri(job.result_path)
+        blob = self._get_bucket(bucket_name).blob(object_name)
+        blob.reload()  # Populates size and content type
+        # Pin the reader to the generation we just sized, so Content-Length stays true
+        reader = blob.open("rb", chunk_size=COPY_CHUNK_SIZE, if_generation_match=blob.generation)
+        return reader, blob.size, blob.content_type or "image/png"
 
 
-def download_input_to_tempfile(job: Job, gcs_bucket: Optional[str] = None) -> Path:
-    """
-    Downloads the 'image_path' from the job to a local temporary file.
-    Used by the worker to process the image.
-    Returns the path to the temporary file on the worker's disk.
-    """
-    if STORAGE_BACKEND == "local":
-        # Local backend just points to the file on disk directly
-        return Path(job.image_path)
+# ------------------------------------------------------------------------------
+# AZURE BLOB STORAGE BACKEND
+# Used when STORAGE_BACKEND="azure".
+# Same object layout as GCS (jobs/items/{id}.json + jobs/pending/{id} markers),
+# so a bucket copied over by tools/gcs_to_azure_copy.py is usable as-is.
+# ------------------------------------------------------------------------------
 
-    elif STORAGE_BACKEND == "gcp":
-        # Parse URI: gs://bucket/input/image.png
-        if job.image_path.startswith("gs://"):
-            _, _, remainder = job.image_path.partition("gs://")
-            bucket_name, _, object_name = remainder.partition("/")
-            
-            client = _get_gcs_client()
-            bucket = client.bucket(bucket_name)
-            blob = bucket.blob(object_name)
-            
-            # Create a temp file to hold the download
-            tmp = tempfile.NamedTemporaryFile(delete=False, suffix=Path(object_name).suffix)
-            blob.download_to_filename(tmp.name)
-            return Path(tmp.name)
-        else:
-            raise ValueError(f"Invalid GCS path: {job.image_path}")
+class AzureBackend:
+    def __init__(self, container_name: Optional[str]):
+        if not container_name:
+            raise ValueError("AZURE_CONTAINER env var is required for Azure backend")
+        try:
+            from azure.storage.blob import BlobServiceClient
+            from azure.core import MatchConditions
+            from azure.core.exceptions import HttpResponseError, ResourceExistsError, ResourceNotFoundError
+        except ImportError as e:
+            raise RuntimeError("azure-storage-blob library is not installed.") from e
+        self._BlobServiceClient = BlobServiceClient
+        self._MatchConditions = MatchConditions
+        self._ResourceExistsError = ResourceExistsError
+        self._ResourceNotFoundError = ResourceNotFoundError
+        self._HttpResponseError = HttpResponseError
+        self.container_name = container_name
+        # One service client (parsed connection string + HTTP pipeline) and one
+        # ContainerClient per container are shared by the whole process; blob
+        # clients derived from them reuse the same connection pool.
+        self._client = None
+        self._containers: Dict[str, "azure.storage.blob.ContainerClient"] = {}
+        self._verified_containers: set = set()
+        self._lock = threading.Lock()
+        self._blob_cache = _BlobCache()
+        self._records = _RecordCache()
+
+    def _get_client(self):
+        """Returns the BlobServiceClient, creating it from the connection string on first use."""
+        if not AZURE_CONN_STR:
+            raise ValueError("AZURE_STORAGE_CONNECTION_STRING env var is missing.")
+        with self._lock:
+            if self._client is None:
+                from azure.core.pipeline.transport import RequestsTransport
+
+                self._client = self._BlobServiceClient.from_connection_string(
+                    AZURE_CONN_STR,
+                    transport=RequestsTransport(session=_pooled_session(), session_owner=False),
+                    connection_timeout=5,
+                    read_timeout=30,
+                )
+            return self._client
+
+    def _get_container(self, container_name: Optional[str] = None):
+        """Returns a cached ContainerClient (defaults to the configured container)."""
+        container_name = container_name or self.container_name
+        container = self._containers.get(container_name)
+        if container is None:
+            container = self._containers.setdefault(
+                container_name, self._get_client().get_container_client(container_name)
+            )
+        return container
+
+    def _get_blob_client(self, object_name: str, container_name: Optional[str] = None):
+        """Returns a client for one blob (defaults to the configured container)."""
+        return self._get_container(container_name).get_blob_client(object_name)
+
+    @staticmethod
+    def _parse_uri(uri: str) -> Tuple[str, str]:
+        """Splits az://container/path/to/obj into (container, path/to/obj)."""
+        _, _, remainder = uri.partition("az://")
+        container_name, _, object_name = remainder.partition("/")
+        return container_name, object_name
+
+    def _ensure_container_exists(self):
+        """Ensures the Azure container exists (checked once per process)."""
+        container_client = self._get_container()
+        if self.container_name in self._verified_containers:
+            return container_client
+        # Creating is a single call either way; "already exists" is the common answer
+        try:
+            container_client.create_container()
+        except self._ResourceExistsError:
+            pass
+        with self._lock:
+            self._verified_containers.add(self.container_name)
+        return container_client
+
+    def _upload_blob(self, object_name: str, data, **kwargs):
+        """upload_blob() into the configured container, recreating it once if it vanished."""
+        blob_client = self._get_blob_client(object_name)
+        start = data.tell() if hasattr(data, "seek") else None
+        try:
+            return blob_client.upload_blob(data, **kwargs)
+        except self._ResourceNotFoundError:
+            # Only the container can be missing on an upload: it was deleted
+            # after we verified it, so forget that, recreate it and retry once.
+            with self._lock:
+                self._verified_containers.discard(self.container_name)
+            self._ensure_container_exists()
+            if start is not None:
+                data.seek(start)
+            return blob_client.upload_blob(data, **kwargs)
+
+    def _write_job(self, job: Job, overwrite: bool = True) -> None:
+        """Uploads a single job record (overwrite=False means create-only)."""
+        data = _JOB_ENCODER.encode(job)
+        props = self._upload_blob(f"{JOB_ITEMS_PREFIX}{job.id}.json", data, overwrite=overwrite)
+        self._records.put(job.id, props["etag"], data)
+
+    def _download_cached(self, uri: str) -> Path:
+        """Downloads an az:// object to the local blob cache, reusing an earlier copy with the same ETag."""
+        container_name, object_name = self._parse_uri(uri)
+        blob_client = self._get_blob_client(object_name, container_name)
+        etag = blob_client.get_blob_properties().etag  # Metadata only: tells us which version is current
+
+        def download(path: Path) -> None:
+            with path.open("wb") as f:
+                # Anything past the first 32 MiB is fetched in parallel ranges
+                blob_client.download_blob(
+                    max_concurrency=TRANSFER_CONCURRENCY,
+                    etag=etag, match_condition=self._MatchConditions.IfNotModified,
+                ).readinto(f)
+
+        return self._blob_cache.fetch(uri, etag, download)
+
+    def create_job_from_file(self, filename: str, fileobj: BinaryIO, content_type: Optional[str] = None) -> Job:
+        self._ensure_container_exists()
 
-    elif STORAGE_BACKEND == "azure":
-        # Parse URI: az://container/input/image.png
-        if job.image_path.startswith("az://"):
-            _, _, remainder = job.image_path.partition("az://")
-            container_name, _, object_name = remainder.partition("/")
-            
-            client = _get_azure_client()
-            container_client = client.get_container_client(container_name)
-            blob_client = container_client.get_blob_client(object_name)
-            
-            # Create temp file and download
-            tmp = tempfile.NamedTemporaryFile(delete=False, suffix=Path(object_name).suffix)
-            with open(tmp.name, "wb") as f:
-                blob_data = blob_client.download_blob()
-                blob_data.readinto(f)
-            return Path(tmp.name)
-        else:
-             raise ValueError(f"Invalid Azure path: {job.image_path}")
+        object_name = f"{INPUT_PREFIX}{filename}" # e.g. input/image.jpg
 
-    else:
-        raise RuntimeError(f"Unsupported STORAGE_BACKEND: {STORAGE_BACKEND}")
+        # Upload file to Azure Blob (the SDK reads the stream in blocks)
+        self._upload_blob(object_name, fileobj, overwrite=True)
 
+        # We invent a custom URI scheme for internal tracking: az://container/path
+        # This makes it easy to recognize Azure paths later.
+        image_path = f"az://{self.container_name}/{object_name}"
 
-def upload_output_from_local(local_output_path: str, job: Job, gcs_bucket: Optional[str] = None) -> str:
-    """
-    Takes a processed file from local disk and uploads it to the backend output folder.
-    Returns the new remote path string (e.g. gs://... or az://...).
-    """
-    if STORAGE_BACKEND == "local":
-        # For local, we just update the job record to point to the file we already wrote
-        out_path = Path(local_output_path)
-        job.result_path = str(out_path)
-        update_job(job)
-        return job.result_path
+        # Update "Database": write the record, then the marker that makes it visible to workers
+        job = Job(id=str(uuid.uuid4()), image_path=image_path, status=JobStatus.PENDING)
+        self._write_job(job, overwrite=False)
+        self._upload_blob(f"{PENDING_PREFIX}{job.id}", b"", overwrite=True)
+        return job
 
-    elif STORAGE_BACKEND == "gcp":
-        client = _get_gcs_client()
-        bucket = _ensure_bucket_exists(gcs_bucket)
-        
-        # Name: output/{job_id}.png
-        object_name = f"{OUTPUT_PREFIX}{job.id}{Path(local_output_path).suffix}"
-        
-        blob = bucket.blob(object_name)
-        blob.upload_from_filename(local_output_path, content_type="image/png")
-        
-        result_path = f"gs://{gcs_bucket}/{object_name}"
+    def get_job(self, job_id: str) -> Optional[Job]:
+        # One GET of jobs/items/{job_id}.json; if we already hold a copy, the GET
+        # only returns a body when the record changed since. A missing blob is
+        # reported by the download itself, so no separate exists() round trip.
+        blob_client = self._get_blob_client(f"{JOB_ITEMS_PREFIX}{job_id}.json")
+        cached = self._records.get(job_id)
+        conditions = {"etag": cached[0], "match_condition": self._MatchConditions.IfModified} if cached else {}
+        try:
+            downloader = blob_client.download_blob(**conditions)
+        except self._ResourceNotFoundError:
+            return None
+        except self._HttpResponseError as e:
+            # The SDK does not raise ResourceNotModifiedError for a 304: it surfaces
+            # as ResourceModifiedError (ConditionNotMet) or a bare HttpResponseError
+            if not (cached and e.status_code == 304):
+                raise
+            data = cached[1]
+        else:
+            data = downloader.readall()
+            self._records.put(job_id, downloader.properties.etag, data)
+        return _JOB_DECODER.decode(data)
+
+    def update_job(self, job: Job) -> None:
+        # One PUT of jobs/items/{job_id}.json, whatever the number of jobs
+        self._write_job(job)
+
+    def get_next_pending_job(self) -> Optional[Job]:
+        container_client = self._get_container()
+        for marker in container_client.list_blobs(name_starts_with=PENDING_PREFIX):
+            # Claim the job: a blob can only be deleted once, so the loser gets a 404
+            try:
+                container_client.delete_blob(marker.name)
+            except self._ResourceNotFoundError:
+                continue  # Another worker got there first
+            job = self.get_job(marker.name[len(PENDING_PREFIX):])
+            if job and job.status == JobStatus.PENDING:
+                return job
+        return None
+
+    def download_input_to_buffer(self, job: Job) -> BinaryIO:
+        if not job.image_path.startswith("az://"):
+            raise ValueError(f"Invalid Azure path: {job.image_path}")
+        return open(_hedged(lambda: self._download_cached(job.image_path)), "rb")
+
+    def upload_output_from_buffer(self, data: BinaryIO, job: Job) -> str:
+        object_name = f"{OUTPUT_PREFIX}{job.id}.png"
+        # Files above 32 MiB go up as blocks, TRANSFER_CONCURRENCY at a time
+        self._upload_blob(object_name, data, overwrite=True, max_concurrency=TRANSFER_CONCURRENCY)
+
+        result_path = f"az://{self.container_name}/{object_name}"
         job.result_path = result_path
-        
-        update_job(job, gcs_bucket=gcs_bucket)
         return result_path
 
-    elif STORAGE_BACKEND == "azure":
-        client = _get_azure_client()
-        if not AZURE_CONTAINER:
-             raise ValueError("AZURE_CONTAINER missing")
-        container_client = client.get_container_client(AZURE_CONTAINER)
-        
-        # Name: output/{job_id}.png
-        object_name = f"{OUTPUT_PREFIX}{job.id}{Path(local_output_path).suffix}"
-        blob_client = container_client.get_blob_client(object_name)
-        
-        with open(local_output_path, "rb") as data:
-            blob_client.upload_blob(data, overwrite=True)
-            
-        result_path = f"az://{AZURE_CONTAINER}/{object_name}"
-        job.result_path = result_path
-        
-        update_job(job) # azure container is global/env var, so no arg passed here usually, but we check implementation
-        return result_path
+    def download_result_to_tempfile(self, job: Job) -> Path:
+        if not (job.result_path and job.result_path.startswith("az://")):
+            raise ValueError("job.result_path missing or not an Azure path")
+        return _hedged(lambda: self._download_cached(job.result_path))
 
-    else:
-        raise RuntimeError(f"Unsupported STORAGE_BACKEND: {STORAGE_BACKEND}")
+    def open_result_stream(self, job: Job) -> Optional[Tuple[BinaryIO, int, str]]:
+        return None
 
 
-def download_result_to_tempfile(job: Job, gcs_bucket: Optional[str] = None) -> Path:
-    """
-    Used by the API to serve the result image to the user.
-    Downloads the 'result_path' to a temp file so the API can return it as a FileResponse.
-    """
-    if STORAGE_BACKEND == "local":
-        return Path(job.result_path)
+# ------------------------------------------------------------------------------
+# BACKEND SELECTION
+# Resolved once at import; callers use STORAGE.<method>() with no branching.
+# ------------------------------------------------------------------------------
 
+def _make_backend() -> StorageBackend:
+    if STORAGE_BACKEND == "local":
+        return LocalBackend()
     elif STORAGE_BACKEND == "gcp":
-        client = _get_gcs_client()
-        if job.result_path and job.result_path.startswith("gs://"):
-            _, _, remainder = job.result_path.partition("gs://")
-            bucket_name, _, object_name = remainder.partition("/")
-            
-            bucket = client.bucket(bucket_name)
-            blob = bucket.blob(object_name)
-            
-            tmp = tempfile.NamedTemporaryFile(delete=False, suffix=Path(object_name).suffix)
-            blob.download_to_filename(tmp.name)
-            return Path(tmp.name)
-        else:
-            raise ValueError("job.result_path missing or not a GCS path")
-
+        return GCSBackend(GCS_BUCKET)
     elif STORAGE_BACKEND == "azure":
-        client = _get_azure_client()
-        if job.result_path and job.result_path.startswith("az://"):
-            _, _, remainder = job.result_path.partition("az://")
-            container_name, _, object_name = remainder.partition("/")
-            
-            container_client = client.get_container_client(container_name)
-            blob_client = container_client.get_blob_client(object_name)
-            
-            tmp = tempfile.NamedTemporaryFile(delete=False, suffix=Path(object_name).suffix)
-            with open(tmp.name, "wb") as f:
-                blob_data = blob_client.download_blob()
-                blob_data.readinto(f)
-            return Path(tmp.name)
-        else:
-            raise ValueError("job.result_path missing or not an Azure path")
-
+        return AzureBackend(AZURE_CONTAINER)
     else:
         raise RuntimeError(f"Unsupported STORAGE_BACKEND: {STORAGE_BACKEND}")
+
+STORAGE: StorageBackend = _make_backend()
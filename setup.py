@@ -0,0 +1,23 @@
+"""
+Optional build step: compiles the storage layer with Cython.
+
+    pip install cython
+    python setup.py build_ext --inplace
+
+The compiled extension modules sit next to the .py sources and take
+precedence on import. Without the build step (or without a compiler) the
+plain Python modules are used, with identical behavior.
+"""
+from setuptools import setup
+from Cython.Build import cythonize
+
+setup(
+    name="cloud-migration-spot",
+    # Nothing to install: this file only exists to build the extensions in place.
+    packages=[],
+    py_modules=[],
+    ext_modules=cythonize(
+        ["common/storage.py", "common/job_schema.py"],
+        compiler_directives={"language_level": 3},
+    ),
+)
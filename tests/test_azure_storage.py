@@ -0,0 +1,120 @@
+import io
+import itertools
+from urllib.parse import urlparse
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+pytest.importorskip("azure.storage.blob")
+
+from common import storage
+from common.job_schema import JobStatus
+
+
+class FakeBlobService(BaseAdapter):
+    """Minimal Blob REST endpoint behind the real azure-storage-blob client."""
+
+    def __init__(self):
+        super().__init__()
+        self.blobs = {}  # path -> (body, etag)
+        self.containers = set()
+        self.requests = []
+        self._etags = itertools.count(1)
+
+    def send(self, request, **kwargs):
+        url = urlparse(request.url)
+        path = url.path
+        self.requests.append((request.method, path, request.headers.get("If-None-Match")))
+        if "restype=container" in url.query:
+            if path in self.containers:
+                return self._response(request, 409, {"x-ms-error-code": "ContainerAlreadyExists"})
+            self.containers.add(path)
+            return self._response(request, 201, {"ETag": '"c"'})
+        if request.method == "PUT":
+            body = request.body or b""
+            if hasattr(body, "read"):
+                body = body.read()
+            if request.headers.get("If-None-Match") == "*" and path in self.blobs:
+                return self._response(request, 409, {"x-ms-error-code": "BlobAlreadyExists"})
+            etag = f'"0x{next(self._etags)}"'
+            self.blobs[path] = (bytes(body), etag)
+            return self._response(request, 201, {"ETag": etag})
+        if request.method == "GET":
+            if path not in self.blobs:
+                return self._response(request, 404, {"x-ms-error-code": "BlobNotFound"})
+            body, etag = self.blobs[path]
+            if request.headers.get("If-None-Match") == etag:
+                # What the service sends for an unchanged blob
+                return self._response(request, 304, {"ETag": etag, "x-ms-error-code": "ConditionNotMet"})
+            return self._response(request, 206 if "x-ms-range" in request.headers else 200, {
+                "ETag": etag,
+                "Content-Length": str(len(body)),
+                "Content-Range": f"bytes 0-{len(body) - 1}/{len(body)}",
+                "x-ms-blob-type": "BlockBlob",
+            }, body)
+        raise AssertionError(f"unexpected {request.method} {path}")
+
+    def _response(self, request, status, headers, body=b""):
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict({"Content-Length": str(len(body)), **headers})
+        response._content = body
+        response.raw = io.BytesIO(body)
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def azure_backend(monkeypatch):
+    service = FakeBlobService()
+
+    def pooled_session(session=None):
+        session = session if session is not None else requests.Session()
+        session.mount("https://", service)
+        return session
+
+    monkeypatch.setattr(storage, "_pooled_session", pooled_session)
+    monkeypatch.setattr(
+        storage,
+        "AZURE_CONN_STR",
+        "DefaultEndpointsProtocol=https;AccountName=acct;AccountKey=a2V5;EndpointSuffix=core.windows.net",
+    )
+    return storage.AzureBackend("jobs"), service
+
+
+def test_get_job_reuses_cached_record_on_304(azure_backend):
+    backend, service = azure_backend
+    job = backend.create_job_from_file("a.png", io.BytesIO(b"image"))
+
+    # The record's ETag was cached by the write, so this read is conditional
+    fetched = backend.get_job(job.id)
+
+    assert fetched == job
+    assert fetched.status == JobStatus.PENDING
+    method, path, if_none_match = service.requests[-1]
+    assert (method, path) == ("GET", f"/jobs/jobs/items/{job.id}.json")
+    assert if_none_match == service.blobs[path][1]
+
+
+def test_get_job_sees_changes_after_conditional_read(azure_backend):
+    backend, service = azure_backend
+    job = backend.create_job_from_file("a.png", io.BytesIO(b"image"))
+    backend.get_job(job.id)
+
+    # Another process updates the record behind this backend's cache
+    path = f"/jobs/jobs/items/{job.id}.json"
+    job.status = JobStatus.DONE
+    service.blobs[path] = (storage._JOB_ENCODER.encode(job), '"0xother"')
+
+    assert backend.get_job(job.id).status == JobStatus.DONE
+
+
+def test_get_job_missing_record(azure_backend):
+    backend, _ = azure_backend
+    assert backend.get_job("nope") is None
@@ -0,0 +1,67 @@
+from pathlib import Path
+
+import pytest
+
+from common import storage
+
+
+@pytest.fixture
+def downloads():
+    calls = []
+
+    def download_for(data):
+        def download(path):
+            calls.append(path)
+            path.write_bytes(data)
+        return download
+
+    download_for.calls = calls
+    return download_for
+
+
+def test_same_version_is_downloaded_once(downloads):
+    cache = storage._BlobCache()
+
+    first = cache.fetch("gs://b/input/a.png", 1, downloads(b"v1"))
+    second = cache.fetch("gs://b/input/a.png", 1, downloads(b"v1"))
+
+    assert first == second
+    assert first.read_bytes() == b"v1"
+    assert first.suffix == ".png"
+    assert len(downloads.calls) == 1
+
+
+def test_new_version_is_downloaded_again(downloads):
+    cache = storage._BlobCache()
+
+    old = cache.fetch("az://c/input/a.png", '"0x1"', downloads(b"old"))
+    new = cache.fetch("az://c/input/a.png", '"0x2"', downloads(b"new"))
+
+    assert old != new
+    assert new.read_bytes() == b"new"
+    assert len(downloads.calls) == 2
+
+
+def test_least_recently_used_files_are_evicted_over_budget(downloads):
+    cache = storage._BlobCache(max_bytes=8)
+
+    a = cache.fetch("gs://b/a", 1, downloads(b"aaaa"))
+    b = cache.fetch("gs://b/b", 1, downloads(b"bbbb"))
+    cache.fetch("gs://b/a", 1, downloads(b"aaaa"))  # a is now the most recently used
+    c = cache.fetch("gs://b/c", 1, downloads(b"cccc"))
+
+    assert a.exists() and c.exists()
+    assert not b.exists()
+
+
+def test_failed_download_leaves_nothing_behind():
+    cache = storage._BlobCache()
+
+    def broken(path):
+        path.write_bytes(b"half")
+        raise IOError("connection reset")
+
+    with pytest.raises(IOError):
+        cache.fetch("gs://b/a", 1, broken)
+    assert list(cache._entries) == []
+    assert not any(p.name.endswith(".part") for p in Path(cache._dir.name).iterdir())
@@ -0,0 +1,93 @@
+import io
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("google.cloud.storage")
+
+from common import storage
+from common.job_schema import Job
+
+
+class FakeBlob:
+    def __init__(self, name, data=b""):
+        self.name = name
+        self.data = data
+        self.size = None
+        self.generation = None
+        self.calls = []
+
+    def reload(self):
+        self.size, self.generation = len(self.data), 7
+
+    def download_to_filename(self, filename, if_generation_match=None):
+        self.calls.append("download_to_filename")
+        Path(filename).write_bytes(self.data)
+
+    def upload_from_file(self, fileobj, content_type=None, size=None, rewind=False):
+        if rewind:
+            fileobj.seek(0)
+        self.calls.append(("upload_from_file", size))
+        self.data = fileobj.read()
+
+
+class FakeBucket:
+    def __init__(self):
+        self.blobs = {}
+
+    def blob(self, name):
+        return self.blobs.setdefault(name, FakeBlob(name))
+
+
+class FakeTransferManager:
+    THREAD = "thread"
+
+    def __init__(self):
+        self.calls = []
+
+    def upload_chunks_concurrently(self, filename, blob, **kwargs):
+        self.calls.append(("upload", kwargs["max_workers"]))
+        blob.data = Path(filename).read_bytes()
+
+    def download_chunks_concurrently(self, blob, filename, **kwargs):
+        self.calls.append(("download", kwargs["max_workers"]))
+        Path(filename).write_bytes(blob.data)
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    monkeypatch.setattr(storage, "PARALLEL_TRANSFER_MIN_BYTES", 16)
+    gcs = storage.GCSBackend("bkt")
+    bucket = FakeBucket()
+    monkeypatch.setattr(gcs, "_get_bucket", lambda bucket_name=None: bucket)
+    gcs._transfer_manager = FakeTransferManager()
+    return gcs, bucket
+
+
+@pytest.mark.parametrize("payload, parallel", [(b"small", False), (b"x" * 40, True)])
+def test_output_upload_switches_to_parallel_chunks_above_threshold(backend, payload, parallel):
+    gcs, bucket = backend
+    job = Job(id="j1", image_path="gs://bkt/input/a.png")
+
+    assert gcs.upload_output_from_buffer(io.BytesIO(payload), job) == "gs://bkt/output/j1.png"
+
+    blob = bucket.blobs["output/j1.png"]
+    assert blob.data == payload
+    if parallel:
+        assert gcs._transfer_manager.calls == [("upload", storage.TRANSFER_CONCURRENCY)]
+        assert blob.calls == []
+    else:
+        assert gcs._transfer_manager.calls == []
+        assert blob.calls == [("upload_from_file", len(payload))]
+
+
+@pytest.mark.parametrize("payload, parallel", [(b"small", False), (b"x" * 40, True)])
+def test_input_download_switches_to_parallel_chunks_above_threshold(backend, payload, parallel):
+    gcs, bucket = backend
+    bucket.blob("input/a.png").data = payload
+
+    with gcs.download_input_to_buffer(Job(id="j1", image_path="gs://bkt/input/a.png")) as src:
+        assert src.read() == payload
+
+    expected = [("download", storage.TRANSFER_CONCURRENCY)] if parallel else []
+    assert gcs._transfer_manager.calls == expected
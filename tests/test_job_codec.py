@@ -0,0 +1,20 @@
+import msgspec
+import pytest
+
+from common.job_schema import Job, JobStatus
+from common.storage import _JOB_DECODER, _JOB_ENCODER
+
+
+@pytest.mark.parametrize("status", list(JobStatus))
+def test_job_round_trips_for_every_status(status):
+    job = Job(id="j1", image_path="input/a.png", result_path="output/j1.png", status=status, error="boom")
+
+    decoded = _JOB_DECODER.decode(_JOB_ENCODER.encode(job))
+
+    assert decoded == job
+    assert decoded.status is status
+
+
+def test_unknown_status_is_rejected():
+    with pytest.raises(msgspec.ValidationError):
+        _JOB_DECODER.decode(b'{"id": "j1", "image_path": "input/a.png", "status": "ARCHIVED"}')
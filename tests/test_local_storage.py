@@ -0,0 +1,81 @@
+import gc
+import io
+import sqlite3
+import threading
+import weakref
+
+import pytest
+
+from common import storage
+from common.job_schema import JobStatus
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "LOCAL_INPUT_DIR", tmp_path / "input")
+    monkeypatch.setattr(storage, "LOCAL_OUTPUT_DIR", tmp_path / "output")
+    monkeypatch.setattr(storage, "LOCAL_JOBS_DB", tmp_path / "jobs.db")
+    local = storage.LocalBackend()
+    yield local
+    local.close()
+
+
+def test_creates_are_not_lost_to_concurrent_reads(backend):
+    # Reads must never rewrite the store from an older snapshot, or a job
+    # created in between would disappear
+    created = []
+    stop = threading.Event()
+
+    def create(n):
+        for i in range(25):
+            created.append(backend.create_job_from_file(f"{n}-{i}.png", io.BytesIO(b"x")).id)
+
+    def read():
+        while not stop.is_set():
+            for job_id in list(created):
+                backend.get_job(job_id)
+
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    writers = [threading.Thread(target=create, args=(n,)) for n in range(4)]
+    for t in readers + writers:
+        t.start()
+    for t in writers:
+        t.join()
+    stop.set()
+    for t in readers:
+        t.join()
+
+    assert len(created) == 100
+    assert all(backend.get_job(job_id).status == JobStatus.PENDING for job_id in created)
+
+
+def test_each_pending_job_is_claimed_once(backend):
+    ids = {backend.create_job_from_file(f"{i}.png", io.BytesIO(b"x")).id for i in range(20)}
+    claimed = []
+
+    def claim():
+        while (job := backend.get_next_pending_job()) is not None:
+            claimed.append(job.id)
+
+    threads = [threading.Thread(target=claim) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(claimed) == sorted(ids)
+    assert backend.get_next_pending_job() is None
+
+
+def test_dropped_backend_closes_its_connections(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "LOCAL_JOBS_DB", tmp_path / "jobs.db")
+    local = storage.LocalBackend()
+    conn = local._db()
+    ref = weakref.ref(local)
+
+    del local
+    gc.collect()
+
+    assert ref() is None
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
@@ -0,0 +1,13 @@
+from common import storage
+
+
+def test_pool_is_sized_and_only_retries_failed_connects():
+    adapter = storage._pooled_session().get_adapter("https://storage.googleapis.com/")
+
+    assert adapter._pool_maxsize == storage.HTTP_POOL_SIZE
+    retries = adapter.max_retries
+    assert retries.connect == 3
+    # Requests that reached the server (e.g. a claiming DELETE) are never re-sent here
+    assert retries.read == 0
+    assert retries.status == 0
+    assert retries.other == 0
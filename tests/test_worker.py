@@ -0,0 +1,60 @@
+import importlib
+import io
+
+import pytest
+from PIL import Image
+
+from common.job_schema import Job, JobStatus
+from worker import worker
+
+
+class RecordingStorage:
+    def __init__(self, image=None):
+        self.image = image
+        self.saved = []
+
+    def download_input_to_buffer(self, job):
+        if self.image is None:
+            raise IOError("input missing")
+        return io.BytesIO(self.image)
+
+    def upload_output_from_buffer(self, data, job):
+        job.result_path = f"output/{job.id}.png"
+        return job.result_path
+
+    def update_job(self, job):
+        self.saved.append(job.status)
+
+
+@pytest.fixture
+def default_worker(monkeypatch):
+    monkeypatch.delenv("EMIT_PROCESSING_STATE", raising=False)
+    yield importlib.reload(worker)
+    importlib.reload(worker)
+
+
+def _png():
+    out = io.BytesIO()
+    Image.new("RGB", (4, 4), "red").save(out, format="PNG")
+    return out.getvalue()
+
+
+def test_processing_state_is_saved_by_default(default_worker, monkeypatch):
+    # A claimed job whose worker dies must not be left looking PENDING
+    storage = RecordingStorage(_png())
+    monkeypatch.setattr(default_worker, "STORAGE", storage)
+
+    default_worker.process_job(Job(id="j1", image_path="input/a.png"))
+
+    assert storage.saved == [JobStatus.PROCESSING, JobStatus.DONE]
+
+
+def test_failed_job_is_saved_after_processing_state(default_worker, monkeypatch):
+    storage = RecordingStorage()
+    monkeypatch.setattr(default_worker, "STORAGE", storage)
+    job = Job(id="j1", image_path="input/a.png")
+
+    default_worker.process_job(job)
+
+    assert storage.saved == [JobStatus.PROCESSING, JobStatus.FAILED]
+    assert job.error == "input missing"
@@ -2,10 +2,19 @@
 
 # --- Import necessary libraries ---
 import os
+# Used to decode the base64 MD5 that GCS reports for each object.
+import base64
+# Thread pool used to copy several blobs at once.
+from concurrent.futures import ThreadPoolExecutor
 # Import the Google Cloud Storage client library.
 from google.cloud import storage as gcs
 # Import the Azure Storage Blob client library, specifically the main service client.
-from azure.storage.blob import BlobServiceClient
+from azure.storage.blob import BlobServiceClient, ContentSettings
+# Raised by Azure when the destination blob does not exist yet.
+from azure.core.exceptions import ResourceNotFoundError
+# Lets us hand the Azure SDK our own HTTP session, with a bigger connection pool.
+from azure.core.pipeline.transport import RequestsTransport
+import requests
 
 # --- Configuration (Environment Variables) ---
 # Read the name of the source GCS bucket from environment variables.
@@ -18,6 +27,54 @@ AZURE_CONN_STR = os.environ["AZURE_STORAGE_CONNECTION_STRING"]
 # This is where the data will be copied to.
 AZURE_CONTAINER = os.environ["AZURE_CONTAINER"]
 
+# --- Transfer tuning ---
+# Number of blobs copied in parallel. Each copy mostly waits on the network,
+# so throughput grows with this until the link is saturated.
+COPY_WORKERS = int(os.getenv("COPY_WORKERS", "16"))
+# Blocks of each blob uploaded to Azure at the same time.
+UPLOAD_CONCURRENCY = 4
+# Size of each read from GCS and of each block sent to Azure. The Azure client
+# is built with the same single-upload limit, so it never buffers a whole
+# (up to 64 MiB) blob: memory per in-flight copy is about
+# (UPLOAD_CONCURRENCY + 1) x READ_CHUNK_SIZE, whatever the size of the object.
+READ_CHUNK_SIZE = 8 * 1024 * 1024
+
+# --- Copy a single blob ---
+def _copy_one(blob, az_container):
+    # Get a client reference for the destination blob in Azure.
+    # The Azure blob will have the same name as the GCS blob (blob.name).
+    dest = az_container.get_blob_client(blob.name)
+
+    # GCS gives the MD5 as base64 (None for composite objects); Azure keeps raw bytes.
+    source_md5 = base64.b64decode(blob.md5_hash) if blob.md5_hash else None
+
+    # Skip blobs already copied by an earlier run: same size and same MD5.
+    # This makes re-runs only transfer new or changed objects.
+    if source_md5 is not None:
+        try:
+            props = dest.get_blob_properties()
+        except ResourceNotFoundError:
+            props = None
+        if (props is not None and props.size == blob.size
+                and props.content_settings.content_md5 is not None
+                and bytes(props.content_settings.content_md5) == source_md5):
+            print(f"Skipped {blob.name} (unchanged)")
+            return
+
+    # Stream the GCS object chunk by chunk instead of downloading it into memory,
+    # and let the Azure SDK upload the stream in blocks (UPLOAD_CONCURRENCY at a time).
+    # overwrite=True ensures that if a file with the same name exists, it is replaced.
+    # The source MD5 is stored on the Azure blob (block uploads don't compute one)
+    # so the next run can compare against it.
+    with blob.open("rb", chunk_size=READ_CHUNK_SIZE) as stream:
+        dest.upload_blob(
+            stream, overwrite=True, max_concurrency=UPLOAD_CONCURRENCY, length=blob.size,
+            content_settings=ContentSettings(content_md5=source_md5),
+        )
+
+    # Print a message confirming the copy operation for traceability.
+    print(f"Copied {blob.name}")
+
 # --- Main Migration Function ---
 def main():
     # 1. --- Initialize Google Cloud Storage Clients ---
@@ -31,9 +88,21 @@ def main():
 
     # 2. --- Initialize Azure Blob Storage Clients ---
     
+    # Every copy thread can have UPLOAD_CONCURRENCY requests open at once, far more
+    # than the 10 connections requests keeps per host by default, so size the pool
+    # to match instead of opening and dropping connections.
+    session = requests.Session()
+    session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=COPY_WORKERS * UPLOAD_CONCURRENCY))
+
     # Creates a Blob Service Client using the connection string. This is the 
     # top-level object used to interact with the Azure Storage Account.
-    az_client = BlobServiceClient.from_connection_string(AZURE_CONN_STR)
+    # Blobs above READ_CHUNK_SIZE are sent as READ_CHUNK_SIZE blocks (see above).
+    az_client = BlobServiceClient.from_connection_string(
+        AZURE_CONN_STR,
+        max_single_put_size=READ_CHUNK_SIZE,
+        max_block_size=READ_CHUNK_SIZE,
+        transport=RequestsTransport(session=session, session_owner=False),
+    )
     
     # --- Try to create the destination container ---
     try:
@@ -47,25 +116,10 @@ def main():
 
     # 3. --- Perform the Migration Loop ---
     
-    # List all blobs (files) in the source GCS bucket.
-    # The client.list_blobs() returns an iterable object.
-    for blob in gcs_client.list_blobs(GCS_BUCKET):
-        
-        # Download the content of the current GCS blob into memory as a byte string.
-        # NOTE: This method is suitable for smaller files. For very large files (GBs),
-        # an asynchronous or streaming copy method would be more efficient to avoid OOM errors.
-        data = blob.download_as_bytes()
-        
-        # Get a client reference for the destination blob in Azure.
-        # The Azure blob will have the same name as the GCS blob (blob.name).
-        dest = az_container.get_blob_client(blob.name)
-        
-        # Upload the downloaded byte data to the Azure Blob Storage destination.
-        # overwrite=True ensures that if a file with the same name exists, it is replaced.
-        dest.upload_blob(data, overwrite=True)
-        
-        # Print a message confirming the copy operation for traceability.
-        print(f"Copied {blob.name}")
+    # List all blobs (files) in the source GCS bucket and copy them with a
+    # bounded pool of threads. list() surfaces the first failed copy, if any.
+    with ThreadPoolExecutor(max_workers=COPY_WORKERS) as ex:
+        list(ex.map(lambda blob: _copy_one(blob, az_container), gcs_client.list_blobs(GCS_BUCKET)))
 
 # Standard Python entry point. Ensures main() is called only when the script is executed directly.
 if __name__ == "__main__":
@@ -1,45 +1,96 @@
+import io
+import os
+import random
+import threading
 import time
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
-from common.storage import get_next_pending_job, update_job, download_input_to_tempfile, upload_output_from_local
+from common.storage import STORAGE
 from common.job_schema import JobStatus
 
-from os import getenv
+POLL_INTERVAL = 2  # seconds, longest wait between polls while idle
+MIN_POLL_INTERVAL = 0.25  # seconds, first wait after the queue runs dry
+# Jobs processed at once by this process. Most of a job is waiting on storage,
+# so one job's download/upload overlaps with another's image work.
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "4"))
+# Whether to save the PROCESSING status before working on a job. On GCS and Azure
+# a claim only deletes the job's pending marker, so if the worker then dies (e.g.
+# its spot VM is preempted) nothing will pick the job up again; without this write
+# its record would still say PENDING, hiding that it is stuck. Set to 0 to go
+# straight from PENDING to DONE/FAILED in one write when that cannot happen.
+EMIT_PROCESSING_STATE = os.getenv("EMIT_PROCESSING_STATE", "1") == "1"
 
-POLL_INTERVAL = 2  # seconds
+# Grayscale conversion engine. "vips" uses libvips (pip install pyvips), which
+# decodes and converts the image in strips rather than all at once (the encoded
+# file itself is still read into memory whole) and runs the colour conversion
+# vectorised; the default keeps plain Pillow for local development.
+IMAGE_ENGINE = os.getenv("IMAGE_ENGINE", "pillow")
+if IMAGE_ENGINE == "vips":
+    import pyvips
 
-GCS_BUCKET = getenv("GCS_BUCKET", None)  # used when STORAGE_BACKEND=gcp
+
+def to_grayscale(src):
+    """Converts the image read from a binary file object; returns the PNG in a rewound buffer."""
+    if IMAGE_ENGINE == "vips":
+        img = pyvips.Image.new_from_buffer(src.read(), "", access="sequential").colourspace("b-w")
+        if img.hasalpha():
+            img = img[0]  # Drop alpha like Pillow's convert("L"), so both engines write one band
+        return io.BytesIO(img.write_to_buffer(".png"))
+    out = io.BytesIO()
+    with Image.open(src) as img:
+        img.convert("L").save(out, format="PNG")
+    out.seek(0)
+    return out
 
 def process_job(job):
     try:
         job.status = JobStatus.PROCESSING
-        update_job(job, gcs_bucket=GCS_BUCKET if job.image_path.startswith("gs://") else None)
-
-        input_path = download_input_to_tempfile(job, gcs_bucket=GCS_BUCKET)
-        img = Image.open(input_path)
-        img = img.convert("L")
-        output_path = str(Path("/tmp") / f"{job.id}.png")
-        img.save(output_path)
+        if EMIT_PROCESSING_STATE:
+            STORAGE.update_job(job)
 
-        result_path = upload_output_from_local(output_path, job, gcs_bucket=GCS_BUCKET)
+        # The output stays in memory until uploaded: no temp files of our own
+        with STORAGE.download_input_to_buffer(job) as src:
+            output = to_grayscale(src)
+        STORAGE.upload_output_from_buffer(output, job)  # Sets job.result_path
         job.status = JobStatus.DONE
-        job.result_path = result_path
-        update_job(job, gcs_bucket=GCS_BUCKET)
+        # One write saves both the result path and the final status
+        STORAGE.update_job(job)
         print(f"Processed job {job.id}")
     except Exception as e:
         job.status = JobStatus.FAILED
         job.error = str(e)
-        update_job(job, gcs_bucket=GCS_BUCKET)
+        STORAGE.update_job(job)
         print(f"Failed job {job.id}: {e}")
 
 def main():
-    print("Worker started...")
-    while True:
-        job = get_next_pending_job(gcs_bucket=GCS_BUCKET) if getenv("STORAGE_BACKEND", "local") == "gcp" else get_next_pending_job()
-        if job:
-            process_job(job)
-        else:
-            time.sleep(POLL_INTERVAL)
+    print(f"Worker started ({WORKER_CONCURRENCY} concurrent jobs)...")
+    # One free slot per job that may still start; only poll when one is free
+    slots = threading.BoundedSemaphore(WORKER_CONCURRENCY)
+    delay = MIN_POLL_INTERVAL
+
+    def job_finished(future):
+        slots.release()
+        # process_job records its own failures; this catches ones it could not
+        # save (e.g. the final update_job itself failing), which would otherwise vanish
+        error = future.exception()
+        if error is not None:
+            print(f"Job crashed: {error!r}")
+
+    with ThreadPoolExecutor(max_workers=WORKER_CONCURRENCY, thread_name_prefix="job") as pool:
+        while True:
+            slots.acquire()
+            job = STORAGE.get_next_pending_job()  # Claims the job for this worker
+            if job:
+                pool.submit(process_job, job).add_done_callback(job_finished)
+                # Jobs tend to arrive in bursts: ask again right away, and poll
+                # quickly for a while once the queue looks empty.
+                delay = MIN_POLL_INTERVAL
+            else:
+                slots.release()
+                # Back off towards POLL_INTERVAL while idle. The jitter keeps several
+                # workers from polling the bucket in lockstep.
+                time.sleep(delay * random.uniform(0.8, 1.2))
+                delay = min(delay * 2, POLL_INTERVAL)
 
 if __name__ == "__main__":
     main()